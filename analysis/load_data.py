@@ -0,0 +1,82 @@
+from collections.abc import Hashable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from pandas._typing import Dtype
+
+ROOT = Path(__file__).resolve().parents[1]
+
+Filter = tuple[str, str, Any]
+
+CSV_CHUNK_ROWS = 1 << 18
+
+# low cardinality strings as categories and everything else in the smallest
+# type that holds it, instead of pandas' object/int64/float64 defaults
+DTYPES: dict[str, dict[Hashable, "Dtype"]] = {
+    "runs": {
+        "network_type": "category",
+        "beneficiary_rule": "category",
+        "N": "int32",
+        "T": "float32",
+        "alpha": "float32",
+        "final_frac_coop": "float32",
+    },
+    "timeseries": {
+        "run_id": "category",
+        "iter": "int32",
+        "frac_coop": "float32",
+    },
+}
+
+
+def read_table(name: str, columns: list[str] | None = None, filters: list[Filter] | None = None) -> pd.DataFrame:
+    """
+    Reads the parquet parts in data/parquet/<name>/ when there are any so only
+    the requested columns and the row groups matching filters are loaded,
+    otherwise falls back to data/<name>.csv and applies the same selection
+    while parsing it in chunks. Both hold every sweep logged, the first sweep
+    writing parquet copies the csv rows logged before it into a backfill part.
+    The hidden temporary part of a sweep still running is skipped.
+
+    Parameters
+    ----------
+    name : str
+        Table name, e.g. "runs" or "timeseries".
+
+    columns : list[str] | None
+        Columns to load, None loads every column.
+
+    filters : list[tuple[str, str, object]] | None
+        Predicates in pyarrow form (column, op, value) with op "==" or "in".
+    """
+    dtypes = DTYPES.get(name, {})
+    usecols = None if columns is None else pd.Index(columns)  # pandas' usecols type takes an Index but no list
+
+    parquet_dir = ROOT / "data" / "parquet" / name
+    if parquet_dir.is_dir() and any(not part.name.startswith(".") for part in parquet_dir.glob("*.parquet")):
+        df = pd.read_parquet(parquet_dir, columns=columns, filters=filters)
+    elif not filters:
+        df = pd.read_csv(ROOT / "data" / f"{name}.csv", usecols=usecols, dtype=dtypes)
+    else:
+        # csv has no row groups to skip, so parse it in chunks and only keep the
+        # matching rows of each one instead of materializing the whole file
+        chunks = pd.read_csv(ROOT / "data" / f"{name}.csv", usecols=usecols, dtype=dtypes, chunksize=CSV_CHUNK_ROWS)
+        df = pd.concat([apply_filters(chunk, filters) for chunk in chunks], ignore_index=True)
+
+    # parquet keeps the logged types and concatenated chunks can lose their
+    # categories, so settle on the same types whichever way the table was read
+    return df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+
+
+def apply_filters(df: pd.DataFrame, filters: list[Filter]) -> pd.DataFrame:
+    for col, op, value in filters:
+        if op == "==":
+            df = df.loc[df[col] == value]
+        elif op == "in":
+            df = df.loc[df[col].isin(value)]
+        else:
+            raise ValueError(f"Unsupported filter op '{op}'")
+    return df
@@ -1,18 +1,21 @@
 import os
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+import matplotlib
 import numpy as np
 import pandas as pd
 
+from load_data import read_table
+
+matplotlib.use("Agg")  # plots are only ever saved to file, never shown; must precede pyplot
+import matplotlib.pyplot as plt
 
-def plot_curves(network_type: str, alphas) -> None:
+
+def plot_curves(runs: pd.DataFrame, network_type: str, alphas) -> None:
     ROOT = Path(__file__).resolve().parents[1]
-    runs_path = ROOT / "data" / "runs.csv"
     out_path = ROOT / "docs" / f"curves_{network_type}.png"
 
-    df = pd.read_csv(runs_path)
-    df = df[df["network_type"] == network_type]
+    df = runs[runs["network_type"] == network_type]
 
     if df.empty:
         print(f"No rows for network_type='{network_type}' in runs.csv")
@@ -20,12 +23,15 @@ def plot_curves(network_type: str, alphas) -> None:
 
     plt.figure(figsize=(8, 6))
 
+    # one aggregation pass, rows are alpha and columns are T
+    g = df.groupby(["alpha", "T"])["final_frac_coop"].mean().unstack("T").sort_index(axis=1)
+
     for alpha in alphas:
-        sub = df[np.isclose(df["alpha"], alpha)]
-        if sub.empty:
+        match = g.index[np.isclose(g.index.values, alpha)]
+        if match.empty:
             continue
-        g = sub.groupby("T")["final_frac_coop"].mean().sort_index()
-        plt.plot(g.index.values, g.values, marker="o", label=f"alpha={alpha:.2f}")
+        row = g.loc[match[0]].dropna()
+        plt.plot(row.index.values, row.values, marker="o", label=f"alpha={alpha:.2f}")
 
     plt.xlabel("Temptation T")
     plt.ylabel("Final fraction of cooperators")
@@ -40,5 +46,6 @@ def plot_curves(network_type: str, alphas) -> None:
 
 if __name__ == "__main__":
     alphas = [0.0, 0.3, 0.5, 0.7, 0.9]
+    runs = read_table("runs", columns=["network_type", "T", "alpha", "final_frac_coop"])
     for nt in ["HRG", "PAG"]:
-        plot_curves(nt, alphas)
+        plot_curves(runs, nt, alphas)
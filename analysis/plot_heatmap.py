@@ -1,46 +1,43 @@
 import os
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+import matplotlib
 import numpy as np
 import pandas as pd
 
+from load_data import read_table
+
+matplotlib.use("Agg")  # plots are only ever saved to file, never shown; must precede pyplot
+import matplotlib.pyplot as plt
+
 
-def plot_heatmap(network_type: str) -> None:
+def plot_heatmap(runs: pd.DataFrame, network_type: str) -> None:
     ROOT = Path(__file__).resolve().parents[1]
 
-    runs_path = ROOT / "data" / "runs.csv"
     out_path = ROOT / "docs" / f"heatmap_{network_type}.png"
 
-    df = pd.read_csv(runs_path)
-
-    df = df[df["network_type"] == network_type]
+    df = runs.loc[runs["network_type"] == network_type]
 
     if df.empty:
         print(f"No rows for network_type='{network_type}' in runs.csv")
         return
 
-    table = df.pivot_table(
-        index="alpha",
-        columns="T",
-        values="final_frac_coop",
-        aggfunc="mean",
-    )
-
-    table = table.sort_index(axis=0)  # alpha
-    table = table.sort_index(axis=1)  # T
+    # alpha and T take a handful of discrete values, so average straight into
+    # a (alpha, T) grid instead of going through pivot_table
+    alphas, alpha_idx = np.unique(df["alpha"].to_numpy(), return_inverse=True)
+    Ts, T_idx = np.unique(df["T"].to_numpy(), return_inverse=True)
+    sums = np.zeros((alphas.size, Ts.size))
+    counts = np.zeros_like(sums)
+    np.add.at(sums, (alpha_idx, T_idx), df["final_frac_coop"].to_numpy())
+    np.add.at(counts, (alpha_idx, T_idx), 1)
+    table = np.divide(sums, counts, out=np.full_like(sums, np.nan), where=counts > 0)
 
     plt.figure(figsize=(8, 6))
     im = plt.imshow(
-        table.values,
+        table,
         aspect="auto",
         origin="lower",
-        extent=[
-            table.columns.min(),
-            table.columns.max(),
-            table.index.min(),
-            table.index.max(),
-        ],
+        extent=(Ts.min(), Ts.max(), alphas.min(), alphas.max()),
     )
     plt.colorbar(im, label="Final fraction of cooperators")
     plt.xlabel("Temptation T")
@@ -54,5 +51,6 @@ def plot_heatmap(network_type: str) -> None:
 
 
 if __name__ == "__main__":
+    runs = read_table("runs", columns=["network_type", "T", "alpha", "final_frac_coop"])
     for nt in ["HRG", "PAG"]:
-        plot_heatmap(nt)
+        plot_heatmap(runs, nt)
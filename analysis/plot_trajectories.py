@@ -1,29 +1,47 @@
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+import matplotlib
 import pandas as pd
 
+from load_data import read_table
+
+matplotlib.use("Agg")  # plots are only ever saved to file, never shown; must precede pyplot
+import matplotlib.pyplot as plt
+
+plt.rcParams["agg.path.chunksize"] = 10000  # render the 10k point trajectories in chunks
 
-def plot_trajectories(max_runs: int = 5) -> None:
+MAX_POINTS = 2000
+
+
+def plot_trajectories(runs: pd.DataFrame, max_runs: int = 5) -> None:
     ROOT = Path(__file__).resolve().parents[1]
-    ts_path = ROOT / "data" / "timeseries.csv"
-    runs_path = ROOT / "data" / "runs.csv"
     out_path = ROOT / "docs" / "trajectories_example.png"
 
-    ts = pd.read_csv(ts_path)
-    runs = pd.read_csv(runs_path)
-
     run_ids = runs["run_id"].unique()[:max_runs]
 
     if len(run_ids) == 0:
         print("No runs found in runs.csv")
         return
 
+    ts = read_table(
+        "timeseries",
+        columns=["run_id", "iter", "frac_coop"],
+        filters=[("run_id", "in", list(run_ids))],
+    )
+
     plt.figure(figsize=(8, 6))
 
     for rid in run_ids:
         sub = ts[ts["run_id"] == rid].sort_values("iter")
-        plt.plot(sub["iter"], sub["frac_coop"], alpha=0.5, label=rid)
+        # keep at most ~MAX_POINTS points per line, far more than the figure can resolve
+        stride = max(1, len(sub) // MAX_POINTS)
+        plt.plot(
+            sub["iter"].to_numpy()[::stride],
+            sub["frac_coop"].to_numpy()[::stride],
+            alpha=0.5,
+            label=rid,
+            rasterized=True,
+        )
 
     plt.xlabel("Iteration")
     plt.ylabel("Fraction cooperators")
@@ -37,4 +55,4 @@ def plot_trajectories(max_runs: int = 5) -> None:
 
 
 if __name__ == "__main__":
-    plot_trajectories()
+    plot_trajectories(read_table("runs", columns=["run_id"]))
@@ -0,0 +1,22 @@
+from load_data import read_table
+from plot_curves import plot_curves
+from plot_heatmap import plot_heatmap
+from plot_trajectories import plot_trajectories
+
+
+def run_all_plots(alphas) -> None:
+    """
+    Reads runs once and hands the same frame to every plot instead of each
+    plot parsing the file again.
+    """
+    runs = read_table("runs", columns=["run_id", "network_type", "T", "alpha", "final_frac_coop"])
+
+    for nt in ["HRG", "PAG"]:
+        plot_curves(runs, nt, alphas)
+        plot_heatmap(runs, nt)
+
+    plot_trajectories(runs)
+
+
+if __name__ == "__main__":
+    run_all_plots([0.0, 0.3, 0.5, 0.7, 0.9])
@@ -2,11 +2,41 @@
 This module implements different social dilemma 2X2 normal form games. 
 """
 
+from functools import lru_cache
 from typing import override
 
+import numpy as np
+import numpy.typing as npt
+
 Rewards = tuple[float, float]
 Choices = tuple[bool, bool]
 
+# which payoff takes each of the values [m, 1, 0, 1 - m] (greatest to smallest)
+ORDERS: dict[str, str] = {
+    "prisoners": "trps",
+    "harmony":   "rtsp",
+    "staghunt":  "rtps",
+    "snowdrift": "trsp",
+    "deadlock":  "tprs",
+}
+
+
+@lru_cache(maxsize=None)
+def payoff_matrix(type: str, m: float) -> npt.NDArray[np.float64]:
+    """
+    Builds the read-only 2x2 row player payoff matrix of a dilemma, indexed by
+    [row move, column move] with 1 = cooperate and 0 = defect. Cached so every
+    Dilemma of the same type and m shares one array.
+    """
+    values = dict(zip(ORDERS[type], (m, 1, 0, 1 - m)))
+    payoffs = np.array([
+        [values["p"], values["t"]],
+        [values["s"], values["r"]],
+    ], dtype=np.float64)
+    payoffs.setflags(write=False)
+    return payoffs
+
+
 class Dilemma:
     """
     Class for 2x2 normal form social dilemmas to be built on.
@@ -17,6 +47,7 @@ class Dilemma:
     t: (int)  Temptation        Defect while the other cooperates  
     s: (int)  Sucker            Cooperate while other defects  
     p: (int)  Punishment        Mutual Defection
+    payoffs: (np.ndarray)  2x2 row player payoffs indexed by [row move, column move]
     """
 
     r: float
@@ -46,28 +77,12 @@ class Dilemma:
         """
         assert 1 < m <= 2
 
-        # ordered from greatest to smallest
-        values = [m, 1, 0, 1 - m]
-
-        if type == "prisoners":
-            self.t, self.r, self.p, self.s = values
-        elif type == "harmony":
-            self.r, self.t, self.s, self.p = values
-        elif type == "staghunt":
-            self.r, self.t, self.p, self.s = values
-        elif type == "snowdrift":
-            self.t, self.r, self.s, self.p = values
-        elif type == "deadlock":
-            self.t, self.p, self.r, self.s = values
-        else:
+        if type not in ORDERS:
             raise Exception("Dilemma not in [prisoners, harmony, staghunt, snowdrift, deadlock]")
 
-        self._board: dict[Choices, Rewards] = {
-         (True, True): (self.r, self.r),
-         (True, False): (self.s, self.t),
-         (False, True): (self.t, self.s) ,
-         (False, False): (self.p, self.p),
-         }
+        # the column player's payoffs are payoffs.T
+        self.payoffs: npt.NDArray[np.float64] = payoff_matrix(type, m)
+        (self.p, self.t), (self.s, self.r) = self.payoffs.tolist()
 
 
     @override
@@ -80,7 +95,7 @@ class Dilemma:
         for row_label, row in zip(["C", "D"], [True, False]):
             board += row_label + " "
             for col in [True, False]:
-                r_val, c_val = self._board[(row, col)]
+                r_val, c_val = self.play(row, col)
                 board += "(%.1f, %.1f)" % (r_val, c_val)
             board += "\n"
         return board
@@ -105,4 +120,4 @@ class Dilemma:
             The resulting utility of a row and column players moves (RU, CU)
         """
 
-        return self._board[(r_move, c_move)]
+        return float(self.payoffs[int(r_move), int(c_move)]), float(self.payoffs[int(c_move), int(r_move)])
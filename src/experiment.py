@@ -1,9 +1,18 @@
-# Uses Simulation without changing its API
+# Runs parameter sweeps of Simulation through Simulation(seed=...) and Simulation.iterate
 # Produces the runs.csv + timeseries.csv for logger.py
 
-import random
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
 from main import Simulation
-from logger import log_run_summary, log_timeseries
+from logger import RunLogger, log_run_summary, log_timeseries
+
+import numpy as np
+import numpy.typing as npt
+
+# (run_id, params, stats, frac_coop_history) of one finished run
+RunResult = tuple[str, dict, dict, npt.NDArray[np.float32]]
 
 
 def run_single_simulation(
@@ -17,10 +26,8 @@ def run_single_simulation(
     radius: int,
     rand_beneficiaries: bool,
     seed: int,
-):
-    random.seed(seed)
-
-    sim = Simulation(N)
+) -> RunResult:
+    sim = Simulation(N, seed=seed)
 
     if network_type == "HRG":
         sim.build_HRG()
@@ -29,18 +36,26 @@ def run_single_simulation(
     else:
         raise ValueError("network_type must be 'HRG' or 'PAG'")
 
-    frac_coop_history = []
-
-    for _ in range(iterations):
-        sim.play(temptation=T)
-        sim.calc_surplus(threshold=theta)
-        sim.distribute_tax(taxation=alpha, radius=radius, rand=rand_beneficiaries)
-        sim.update_strategies(intensity=beta, num_updates=1)
-        frac_C, _ = sim.strategy_distribution()
-        frac_coop_history.append(frac_C)
-        sim.reset_payoffs()
-
-    final_frac_coop = frac_coop_history[-1]
+    frac_coop_history = np.empty(iterations, dtype=np.float32)
+    converged = False
+    iters_to_conv = iterations
+
+    for i in range(iterations):
+        sim.iterate(temptation=T, threshold=theta, taxation=alpha, radius=radius,
+                    rand=rand_beneficiaries, intensity=beta, num_updates=1)
+        count = sim.get_num_cooperate()
+        frac_C = count / N
+        frac_coop_history[i] = frac_C
+
+        # nobody can imitate a strategy that is gone, so stop once every agent
+        # shares one and carry the final value through the rest of the history
+        if count == 0 or count == N:
+            converged = True
+            iters_to_conv = i + 1
+            frac_coop_history[i + 1:] = frac_C
+            break
+
+    final_frac_coop, _ = sim.strategy_distribution()  # full precision, the history is float32
     avg_degree = sim.average_degree()
 
     run_id = f"{network_type}_T{T:.2f}_a{alpha:.2f}_s{seed}"
@@ -60,13 +75,41 @@ def run_single_simulation(
 
  
     stats = {
-        "converged": False,
-        "iters_to_conv": iterations,
+        "converged": converged,
+        "iters_to_conv": iters_to_conv,
         "final_frac_coop": final_frac_coop,
     }
 
-    log_timeseries(run_id, frac_coop_history)
-    log_run_summary(run_id, params, stats)
+    return run_id, params, stats, frac_coop_history
+
+
+def run_task(task: dict) -> RunResult:
+    """
+    Unpacks one keyword dict of the sweep for ProcessPoolExecutor.map
+    """
+    return run_single_simulation(**task)
+
+
+def run_many(tasks: list[dict], max_workers: int | None = None) -> Iterator[RunResult]:
+    """
+    Runs every task of a sweep through run_single_simulation in its own
+    process, runs share nothing so this scales with the number of cores.
+
+    Parameters
+    ----------
+    tasks : list[dict]
+        Keyword arguments of run_single_simulation for every run.
+
+    max_workers : int | None
+        Number of processes, defaults to one per core.
+
+    Returns
+    -------
+    Iterator[RunResult] : The results strictly in task order, a slow run holds
+    back the results of every later task until it finishes.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        yield from pool.map(run_task, tasks)
 
 
 def main():
@@ -82,23 +125,30 @@ def main():
     alpha_values = [0.0, 0.3, 0.5, 0.7, 0.9]
     seeds = range(5)  # 5 runs per setting
 
-    for net in network_types:
-        for T in T_values:
-            for alpha in alpha_values:
-                for seed in seeds:
-                    print(f"Running {net}, T={T}, alpha={alpha}, seed={seed}")
-                    run_single_simulation(
-                        network_type=net,
-                        N=N,
-                        iterations=iterations,
-                        T=T,
-                        alpha=alpha,
-                        theta=theta,
-                        beta=beta,
-                        radius=radius,
-                        rand_beneficiaries=rand_beneficiaries,
-                        seed=seed,
-                    )
+    tasks = [
+        {
+            "network_type": net,
+            "N": N,
+            "iterations": iterations,
+            "T": T,
+            "alpha": alpha,
+            "theta": theta,
+            "beta": beta,
+            "radius": radius,
+            "rand_beneficiaries": rand_beneficiaries,
+            "seed": seed,
+        }
+        for net, T, alpha, seed in itertools.product(network_types, T_values, alpha_values, seeds)
+    ]
+
+    # only the parent process writes, in sweep order, as results come back
+    run_logger = RunLogger()
+    for run_id, params, stats, frac_coop_history in run_many(tasks):
+        print(f"Finished {run_id}")
+        log_timeseries(run_id, frac_coop_history)
+        log_run_summary(run_logger, run_id, params, stats)
+
+    run_logger.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,252 @@
+"""
+This module holds the numba compiled kernels for the per-iteration steps of
+the simulation. They work on the flat arrays owned by Simulation and update
+them in place.
+"""
+
+from numba import njit
+import numpy as np
+import numpy.typing as npt
+
+
+@njit(cache=True)
+def play_round(
+        edge_src: npt.NDArray[np.int32],
+        edge_dst: npt.NDArray[np.int32],
+        strategy: npt.NDArray[np.uint8],
+        utility: npt.NDArray[np.float32],
+        payoffs: npt.NDArray[np.float32],
+        ):
+    """
+    Plays one round of the dilemma along every edge and accumulates both
+    players' payoffs into utility.
+
+    Parameters
+    ----------
+    edge_src, edge_dst : np.ndarray[int32]
+        Endpoints of every edge.
+
+    strategy : np.ndarray[uint8]
+        Move of every node, 1 = cooperate and 0 = defect.
+
+    utility : np.ndarray[float32]
+        Accumulated payoff of every node, updated in place.
+
+    payoffs : np.ndarray[float32]
+        The 2x2 row player payoff matrix from Dilemma.payoffs, as float32.
+    """
+    for e in range(edge_src.size):
+        src = edge_src[e]
+        dst = edge_dst[e]
+        s = strategy[src]
+        d = strategy[dst]
+        utility[src] += payoffs[s, d]
+        utility[dst] += payoffs[d, s]
+
+
+@njit(cache=True)
+def calc_surplus(
+        utility: npt.NDArray[np.float32],
+        surplus: npt.NDArray[np.float32],
+        threshold: float,
+        ):
+    """
+    Moves the part of every node's utility above threshold into its surplus.
+
+    Parameters
+    ----------
+    utility : np.ndarray[float32]
+        Accumulated payoff of every node, capped at threshold in place.
+
+    surplus : np.ndarray[float32]
+        Surplus of every node, updated in place.
+
+    threshold : float
+        The surplus threshold.
+    """
+    for i in range(utility.size):
+        if utility[i] > threshold:
+            surplus[i] += utility[i] - threshold
+            utility[i] = threshold
+
+
+@njit(cache=True)
+def distribute_tax(
+        surplus: npt.NDArray[np.float32],
+        benefit: npt.NDArray[np.float32],
+        benef_indptr: npt.NDArray[np.int64],
+        benef_indices: npt.NDArray[np.int32],
+        taxation: float,
+        ):
+    """
+    Taxes the surplus of every node and splits the tax evenly over its
+    beneficiary set, which for node i is benef_indices[benef_indptr[i]:benef_indptr[i + 1]].
+
+    Parameters
+    ----------
+    surplus : np.ndarray[float32]
+        Surplus of every node, reduced in place by the tax.
+
+    benefit : np.ndarray[float32]
+        Received benefits of every node, updated in place.
+
+    benef_indptr, benef_indices : np.ndarray
+        Beneficiary sets of every node in CSR form.
+
+    taxation : float
+        The tax rate applied to the surplus.
+    """
+    for i in range(surplus.size):
+        start = benef_indptr[i]
+        end = benef_indptr[i + 1]
+        if surplus[i] <= 0 or end == start:
+            continue
+
+        tax = surplus[i] * taxation
+        surplus[i] -= tax
+        share = tax / (end - start)
+        for k in range(start, end):
+            benefit[benef_indices[k]] += share
+
+
+@njit(cache=True)
+def play_and_redistribute(
+        edge_src: npt.NDArray[np.int32],
+        edge_dst: npt.NDArray[np.int32],
+        strategy: npt.NDArray[np.uint8],
+        payoffs: npt.NDArray[np.float32],
+        utility: npt.NDArray[np.float32],
+        surplus: npt.NDArray[np.float32],
+        benefit: npt.NDArray[np.float32],
+        threshold: float,
+        benef_indptr: npt.NDArray[np.int64],
+        benef_indices: npt.NDArray[np.int32],
+        taxation: float,
+        ):
+    """
+    Fused reset, play_round, calc_surplus and distribute_tax. The payoffs are
+    zeroed, one pass over the edges plays the round and a single pass over the
+    nodes both splits off the surplus and taxes it, so utility and surplus are
+    only walked once after the edges. With taxation = 0 there is nothing to
+    share, benefit is neither cleared nor written and the caller keeps it at 0.
+
+    Parameters are the same as the kernels it replaces.
+    """
+    utility[:] = 0.0
+    surplus[:] = 0.0
+    if taxation != 0:
+        benefit[:] = 0.0
+
+    play_round(edge_src, edge_dst, strategy, utility, payoffs)
+
+    for i in range(utility.size):
+        if utility[i] <= threshold:
+            continue
+        surplus[i] += utility[i] - threshold
+        utility[i] = threshold
+        if taxation == 0:
+            continue
+
+        start = benef_indptr[i]
+        end = benef_indptr[i + 1]
+        if end == start:
+            continue
+
+        tax = surplus[i] * taxation
+        surplus[i] -= tax
+        share = tax / (end - start)
+        for k in range(start, end):
+            benefit[benef_indices[k]] += share
+
+
+@njit(cache=True)
+def update_strategies(
+        strategy: npt.NDArray[np.uint8],
+        surplus: npt.NDArray[np.float32],
+        benefit: npt.NDArray[np.float32],
+        indptr: npt.NDArray[np.int64],
+        indices: npt.NDArray[np.int32],
+        intensity: float,
+        num_updates: int,
+        rng: np.random.Generator,
+        ):
+    """
+    Draws num_updates random agents and a random neighbor of each, the agent
+    adopts the neighbor's strategy with the Fermi probability
+    1 / (1 + exp(-intensity * (f_j - f_i))). Every draw compares against the
+    strategies from before the call, the adoptions are applied at the end.
+
+    Parameters
+    ----------
+    strategy : np.ndarray[uint8]
+        Move of every node, updated in place.
+
+    surplus, benefit : np.ndarray[float32]
+        Their sum is the fitness of every node.
+
+    indptr, indices : np.ndarray
+        CSR adjacency.
+
+    intensity : float
+        Intensity of selection.
+
+    num_updates : int
+        Number of agents drawn.
+
+    rng : np.random.Generator
+        Source of every draw, all of them are taken in two batches up front.
+    """
+    agents = rng.integers(0, strategy.size, num_updates)
+    uniforms = rng.random((num_updates, 2))  # neighbor pick and adoption draw of every agent
+
+    picked = np.empty(num_updates, dtype=np.int64)
+    adopted = np.empty(num_updates, dtype=np.uint8)
+    count = 0
+    for n in range(num_updates):
+        i = agents[n]
+        degree = indptr[i + 1] - indptr[i]
+        if degree == 0:  # isolated agents have nobody to imitate
+            continue
+        j = indices[indptr[i] + int(uniforms[n, 0] * degree)]
+
+        diff = (surplus[j] + benefit[j]) - (surplus[i] + benefit[i])
+        p = 1.0 / (1.0 + np.exp(-intensity * diff))  # exp overflowing to inf just means p = 0
+        if uniforms[n, 1] < p:
+            picked[count] = i
+            adopted[count] = strategy[j]
+            count += 1
+
+    for k in range(count):
+        strategy[picked[k]] = adopted[k]
+
+
+@njit(cache=True)
+def iterate(
+        edge_src: npt.NDArray[np.int32],
+        edge_dst: npt.NDArray[np.int32],
+        strategy: npt.NDArray[np.uint8],
+        payoffs: npt.NDArray[np.float32],
+        utility: npt.NDArray[np.float32],
+        surplus: npt.NDArray[np.float32],
+        benefit: npt.NDArray[np.float32],
+        threshold: float,
+        benef_indptr: npt.NDArray[np.int64],
+        benef_indices: npt.NDArray[np.int32],
+        taxation: float,
+        indptr: npt.NDArray[np.int64],
+        indices: npt.NDArray[np.int32],
+        intensity: float,
+        num_updates: int,
+        rng: np.random.Generator,
+        ):
+    """
+    One whole iteration of the simulation, play_and_redistribute followed by
+    update_strategies, in a single call from python.
+
+    Parameters are the same as the kernels it combines.
+    """
+    play_and_redistribute(
+        edge_src, edge_dst, strategy, payoffs, utility, surplus,
+        benefit, threshold, benef_indptr, benef_indices, taxation,
+    )
+    update_strategies(strategy, surplus, benefit, indptr, indices, intensity, num_updates, rng)
@@ -1,65 +1,224 @@
+import atexit
 import csv
+import itertools
 import os
+import time
+from typing import IO
+
+import numpy as np
+import numpy.typing as npt
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
 
 RUNS_FILE= "data/runs.csv"
 TIMESERIES_FILE= "data/timeseries.csv"
 
+# userspace buffer of every csv handle, they are never flushed explicitly and
+# only reach the OS when the buffer fills or the handle is closed
+BUFFER_SIZE = 1 << 20
+
+# Parquet copies of the csv files for the analysis scripts. Like the csv files
+# they accumulate over sweeps, every sweep adds one part file to each directory.
+# A part is written under a hidden temporary name and only renamed into place
+# once it is closed, so readers never see a half written file. The first sweep
+# to write a directory also copies the rows its csv file already holds into a
+# backfill part, so the two formats hold the same history.
+RUNS_PARQUET = "data/parquet/runs"
+TIMESERIES_PARQUET = "data/parquet/timeseries"
+BACKFILL_PART_NAME = "part-backfill.parquet"
+
+RUN_SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("seed", pa.int64()),
+    ("network_type", pa.string()),
+    ("N", pa.int64()),
+    ("avg_degree", pa.float64()),
+    ("T", pa.float64()),
+    ("alpha", pa.float64()),
+    ("theta", pa.float64()),
+    ("beta", pa.float64()),
+    ("beneficiary_rule", pa.string()),
+    ("init_frac_coop", pa.float64()),
+    ("converged", pa.bool_()),
+    ("iters_to_conv", pa.int64()),
+    ("final_frac_coop", pa.float64()),
+])
+RUN_FIELDS = RUN_SCHEMA.names
+
+TIMESERIES_SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("iter", pa.int32()),
+    ("frac_coop", pa.float32()),
+])
+
 
 def ensure(path):
     os.makedirs(os.path.dirname(path),exist_ok=True)
 
 
-def write_row(path, fieldnames, row):
+_writers: dict[str, tuple[IO[str], csv.DictWriter]] = {}
+
+
+def open_writer(path: str, fieldnames: list[str]) -> tuple[IO[str], csv.DictWriter]:
+    """
+    Returns a persistent (file, writer) pair for path. The directory check,
+    existence check and header are only done the first time a path is opened,
+    later calls are a dict lookup.
+    """
+    if path in _writers:
+        return _writers[path]
+
     ensure(path)
     exists = os.path.isfile(path)
-    with open(path, "a", newline="") as f:
-        writer = csv.DictWriter(f,fieldnames=fieldnames)
-        if not exists:
-            writer.writeheader()
-        writer.writerow(row)
-
-
-def log_run_summary(run_id, params, stats):
-    fieldnames = [
-    "run_id",
-    "seed",
-    "network_type",
-    "N",
-    "avg_degree",
-    "T",
-    "alpha",
-    "theta",
-    "beta",
-    "beneficiary_rule",
-    "init_frac_coop",
-    "converged",
-    "iters_to_conv",
-    "final_frac_coop",
-]
+    f = open(path, "a", newline="", buffering=BUFFER_SIZE)
+    writer = csv.DictWriter(f, fieldnames=fieldnames)
+    if not exists:
+        writer.writeheader()
+    _writers[path] = (f, writer)
+    return f, writer
+
+
+_parquet_writers: dict[str, tuple[pq.ParquetWriter, str, str]] = {}
+_parts_opened = itertools.count()
+
+
+def part_name() -> str:
+    """
+    A new part file name, unique across processes and across the sweeps of
+    one process.
+    """
+    return f"part-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_parts_opened)}.parquet"
+
+
+def open_parquet_writer(directory: str, schema: pa.Schema) -> pq.ParquetWriter:
+    """
+    Returns a persistent ParquetWriter for this sweep's part file in
+    directory, every write_table call on it becomes one row group in the
+    file. It writes to a hidden temporary file that close_writer renames to
+    the final part name.
+    """
+    if directory in _parquet_writers:
+        return _parquet_writers[directory][0]
+
+    name = part_name()
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    ensure(tmp_path)
+    writer = pq.ParquetWriter(tmp_path, schema)
+    _parquet_writers[directory] = (writer, tmp_path, os.path.join(directory, name))
+    return writer
+
+
+def has_parts(directory: str) -> bool:
+    """
+    Whether directory holds any finished part, the hidden temporary part of a
+    sweep still running doesn't count.
+    """
+    return os.path.isdir(directory) and any(
+        name.endswith(".parquet") and not name.startswith(".") for name in os.listdir(directory)
+    )
+
+
+def backfill_parquet(csv_path: str, directory: str, schema: pa.Schema):
+    """
+    Copies the rows csv_path holds into a part of directory when the directory
+    has no parts yet. The analysis scripts read the parquet parts whenever
+    there are any, so without it every sweep logged before the Parquet copies
+    existed would drop out of the plots. Must run before the sweep writes its
+    first row to csv_path, or that row would end up in both parts.
+    """
+    if has_parts(directory) or not os.path.isfile(csv_path):
+        return
 
+    table = pcsv.read_csv(csv_path, convert_options=pcsv.ConvertOptions(
+        column_types=schema,
+        include_columns=schema.names,
+        include_missing_columns=True,
+    ))
+    if table.num_rows == 0:
+        return
+
+    tmp_path = os.path.join(directory, f".{BACKFILL_PART_NAME}.tmp")
+    ensure(tmp_path)
+    pq.write_table(table.cast(schema), tmp_path)
+    os.replace(tmp_path, os.path.join(directory, BACKFILL_PART_NAME))
+
+
+def close_writer(path: str):
+    if path in _writers:
+        f, _ = _writers.pop(path)
+        f.close()
+    if path in _parquet_writers:
+        writer, tmp_path, final_path = _parquet_writers.pop(path)
+        writer.close()
+        os.replace(tmp_path, final_path)
+
+
+@atexit.register
+def close_writers():
+    for path in list(_writers) + list(_parquet_writers):
+        close_writer(path)
+
+
+def write_row(path, fieldnames, row):
+    _, writer = open_writer(path, fieldnames)
+    writer.writerow(row)
+
+
+class RunLogger:
+    """
+    Keeps a single handle and DictWriter open for the whole sweep so each run
+    summary is one buffered writerow instead of a makedirs/stat/open/close.
+    """
+
+    def __init__(self,
+                 path: str = RUNS_FILE,
+                 fieldnames: list[str] = RUN_FIELDS,
+                 parquet_path: str = RUNS_PARQUET,
+                 ):
+        self.path = path
+        self.parquet_path = parquet_path
+        backfill_parquet(path, parquet_path, RUN_SCHEMA)
+        self.f, self.w = open_writer(path, fieldnames)
+        self.rows: list[dict] = []  # the summaries are tiny, so they go to parquet as one row group on close
+        atexit.register(self.close)
+
+
+    def log(self, row: dict):
+        self.w.writerow(row)
+        self.rows.append(row)
+
+
+    def close(self):
+        close_writer(self.path)
+        if self.rows:
+            open_parquet_writer(self.parquet_path, RUN_SCHEMA).write_table(pa.Table.from_pylist(self.rows, schema=RUN_SCHEMA))
+            close_writer(self.parquet_path)
+            self.rows = []
+
+
+def log_run_summary(logger: RunLogger, run_id, params, stats):
     row = {"run_id":run_id}
     row.update(params)
     row.update(stats)
-    write_row(RUNS_FILE, fieldnames, row)
+    logger.log(row)
 
 
+def log_timeseries(run_id, coop_history: npt.NDArray[np.float32]):
+    fields = ["run_id", "iter", "frac_coop"]
+    if TIMESERIES_FILE not in _writers:  # first run of the sweep, copy the earlier ones over first
+        backfill_parquet(TIMESERIES_FILE, TIMESERIES_PARQUET, TIMESERIES_SCHEMA)
+    f, _ = open_writer(TIMESERIES_FILE, fields)
 
+    # one preformatted write per run instead of a writerow call per iteration,
+    # str() of the float32 values keeps their shortest repr (0.207
+    # rather than 0.20700000226497650)
+    f.write("".join(f"{run_id},{i},{val!s}\r\n" for i, val in enumerate(coop_history)))
 
-def log_timeseries(run_id, coop_list):
-    fields = ["run_id", "iter", "frac_coop"]
-    ensure(TIMESERIES_FILE)
-
-
-    exists = os.path.isfile(TIMESERIES_FILE)
-    with open(TIMESERIES_FILE, "a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        if not exists:
-            writer.writeheader()
-        
-        for i, val in enumerate(coop_list):
-            writer.writerow({
-                "run_id": run_id,
-                "iter": i,
-                "frac_coop": float(val)
-
-            })
+    # one row group per run so readers can skip whole runs by run_id
+    n = coop_history.size
+    open_parquet_writer(TIMESERIES_PARQUET, TIMESERIES_SCHEMA).write_table(pa.table({
+        "run_id": [run_id] * n,
+        "iter": np.arange(n, dtype=np.int32),
+        "frac_coop": coop_history,
+    }, schema=TIMESERIES_SCHEMA))
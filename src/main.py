@@ -5,60 +5,68 @@ Promotes Cooperation in Multiagent Systems: https://arxiv.org/pdf/1802.01730.
 Authored by Flavio L. Pinherio and Fernando P. Santos.
 """
 
+from collections import deque
 from dilemma import Dilemma
 from enum import Enum
-from typing import TypedDict
-import math
+from itertools import chain
+import kernels
 import random
 
+import numpy as np
+import numpy.typing as npt
+
 
 class Strategy(Enum):
     """
-    Decisions of agents.
+    Decisions of agents, stored as 1/0 in Simulation.strategy.
     """
     COOPERATE = True
     DEFECT = False
 
 
-class Node(TypedDict):
-    """
-    Represents an agent in the network.
-    """
-    id: int
-    neighbors: set[int]
-    strategy: Strategy
-    benefit: float
-    surplus: float
-    utility: float
-
-
 class Simulation():
     def __init__(self, 
                  num_nodes: int,
-                 dilemma: None | Dilemma = None
+                 dilemma: None | Dilemma = None,
+                 seed: None | int = None
                  ):
 
         self.num_nodes: int  = num_nodes
-        self.beneficiary_sets: dict[int, set[int]] = {} # this is used to memoize collecting the sets
-        self.edges: set[frozenset[int]] = set()  # edges can be represented as frozensets within this set to be immutable while avoiding repeats
-        self.graph: dict[int, Node] = {
-            i: {
-                'id': i,
-                'strategy': Strategy.COOPERATE if i % 2 == 0 else Strategy.DEFECT,  # even = cooperate, odd = defect
-                'utility': 0,
-                'benefit': 0,
-                'surplus': 0,
-                'neighbors': set()  # neighbors will be added later according to different graph structures
-            }
-            for i in range(num_nodes)
-        }
+        self.rng: np.random.Generator = np.random.default_rng(seed)  # drives the strategy updates and the random_* helpers
+        self.random: random.Random = random.Random(seed)  # drives the graph builders and the random beneficiary sets, one draw at a time
+        self.beneficiary_sets: dict[tuple[int, int], set[int]] = {} # this is used to memoize collecting the sets, keyed by (center, radius)
+        self.random_beneficiary_sets: dict[int, set[int]] = {} # same for the random sets, keyed by node
+        self.beneficiary_csrs: dict[tuple[int, bool], tuple[npt.NDArray[np.int64], npt.NDArray[np.int32]]] = {}  # every node's set packed for the tax kernel, keyed by (radius, rand)
+        self.payoff_tables: dict[tuple[str, float], npt.NDArray[np.float32]] = {}  # built once per (dtype, temptation) instead of every round
+        self.edges: set[int] = set()  # edges are packed as (smaller << 32) | larger within this set to avoid repeats
+        self.neighbors: list[set[int]] = [set() for _ in range(num_nodes)]  # adjacency while building, neighbors will be added later according to different graph structures
+        # self.edges and self.neighbors are only used while building, __finalize_graph drops them once the arrays below are filled
+        self.degree: npt.NDArray[np.int32] = np.zeros(num_nodes, dtype=np.int32)  # filled once the graph is built
+        self.edge_src: npt.NDArray[np.int32] = np.empty(0, dtype=np.int32)  # endpoint arrays of self.edges, filled once the graph is built
+        self.edge_dst: npt.NDArray[np.int32] = np.empty(0, dtype=np.int32)
+        self.indptr: npt.NDArray[np.int64] = np.zeros(num_nodes + 1, dtype=np.int64)  # CSR adjacency, the neighbors of i are indices[indptr[i]:indptr[i + 1]]
+        self.indices: npt.NDArray[np.int32] = np.empty(0, dtype=np.int32)
+        self.strategy: npt.NDArray[np.uint8] = np.full(num_nodes, Strategy.DEFECT.value, dtype=np.uint8)
+        self.strategy[::2] = Strategy.COOPERATE.value  # even = cooperate, odd = defect
+        self.utility: npt.NDArray[np.float32] = np.zeros(num_nodes, dtype=np.float32)
+        self.surplus: npt.NDArray[np.float32] = np.zeros(num_nodes, dtype=np.float32)
+        self.benefit: npt.NDArray[np.float32] = np.zeros(num_nodes, dtype=np.float32)
+        self.taxed: bool = False  # whether benefit may still hold shares from a taxed round
 
 
     def print_graph(self):
         """
         Prints the graph with each node on a new line
         """
-        for node, vals in self.graph.items():
+        for node in range(self.num_nodes):
+            vals = {
+                'id': node,
+                'neighbors': self.indices[self.indptr[node]:self.indptr[node + 1]].tolist(),
+                'strategy': int(self.strategy[node]),
+                'utility': float(self.utility[node]),
+                'surplus': float(self.surplus[node]),
+                'benefit': float(self.benefit[node]),
+            }
             print(f'{node}: {vals}')
 
 
@@ -66,17 +74,40 @@ class Simulation():
         """
         Helper function for adding an edge to the graph
         """
-        if frozenset((node_0, node_1)) in self.edges:
+        edge = (node_0 << 32) | node_1 if node_0 < node_1 else (node_1 << 32) | node_0
+        if edge in self.edges:
             return False
-        self.graph[node_0]['neighbors'].add(node_1)
-        self.graph[node_1]['neighbors'].add(node_0)
-        self.edges.add(frozenset((node_0, node_1)))
+        self.neighbors[node_0].add(node_1)
+        self.neighbors[node_1].add(node_0)
+        self.edges.add(edge)
         return True
 
 
+    def __finalize_graph(self):
+        """
+        Helper function for flattening the built graph into the edge endpoint
+        arrays and the CSR adjacency
+        """
+        packed = np.fromiter(self.edges, dtype=np.int64, count=len(self.edges))
+        self.edge_src = (packed >> 32).astype(np.int32)
+        self.edge_dst = (packed & 0xFFFFFFFF).astype(np.int32)
+
+        self.degree = np.fromiter((len(neighbors) for neighbors in self.neighbors), dtype=np.int32, count=self.num_nodes)
+        np.cumsum(self.degree, out=self.indptr[1:])
+        self.indices = np.fromiter(
+            chain.from_iterable(sorted(neighbors) for neighbors in self.neighbors),
+            dtype=np.int32,
+            count=int(self.indptr[-1]),
+        )
+
+        # the arrays are the graph from here on, free the build-time sets
+        self.edges = set()
+        self.neighbors = []
+
+
     def build_HRG(self, degree: int=4, attempts: int=10):
         """
-        Homogenous Random Graph: adds edges to self.graph with an even distribution
+        Homogenous Random Graph: adds edges to the graph with an even distribution
         this is a relaxed implementation where one node often ends up with with degree - 1 
         or degree - 2 becuase it's much simpler to implement and will serve the same purpose for 
         this simulation
@@ -89,53 +120,75 @@ class Simulation():
             attempts : int
                 Stop building after this many consecutive failed attempts to create a new edge.
         """
-        if len(self.edges) > 0:
+        if len(self.edges) > 0 or self.indptr[-1] > 0:
             print('This graph has already been populated')
             return
         
         assert degree < self.num_nodes
 
-        available_nodes = set(range(self.num_nodes))
+        # nodes still below degree, position maps a node to its index in available_nodes
+        # so a full node can be swapped with the last entry and popped in O(1)
+        available_nodes = list(range(self.num_nodes))
+        position = list(range(self.num_nodes))
+
+        def remove(node: int):
+            last = available_nodes[-1]
+            available_nodes[position[node]] = last
+            position[last] = position[node]
+            _ = available_nodes.pop()
+
         unsuccessful = 0
         while len(available_nodes) > 1:
-            node_0 = random.choice(list(available_nodes))
-            node_1 = random.choice(list(available_nodes.difference({node_0})))
+            # a uniformly random pair of distinct available nodes
+            idx_0 = self.random.randrange(len(available_nodes))
+            idx_1 = self.random.randrange(len(available_nodes) - 1)
+            if idx_1 >= idx_0:
+                idx_1 += 1
+            node_0, node_1 = available_nodes[idx_0], available_nodes[idx_1]
             if self.__add_edge(node_0, node_1):
-                if len(self.graph[node_0]['neighbors']) == degree:
-                    available_nodes.remove(node_0)
-                if len(self.graph[node_1]['neighbors']) == degree:
-                    available_nodes.remove(node_1)
+                if len(self.neighbors[node_0]) == degree:
+                    remove(node_0)
+                if len(self.neighbors[node_1]) == degree:
+                    remove(node_1)
                 unsuccessful = 0
             else:
                 unsuccessful += 1
 
             if unsuccessful == attempts:
                 print(f'Quit building HRG after {attempts} consecutive failed attempts')
-                return
+                break
+
+        self.__finalize_graph()
 
 
     def build_PAG(self, edges_new: int=2):
         """
-        Preferential Attachment Graph: adds edges to self.graph using preferential attachment
+        Preferential Attachment Graph: adds edges to the graph using preferential attachment
 
         Parameters
         ----------
         edges_new : int 
             Number of edges created when a new node enters the graph.
         """
-        if len(self.edges) > 0:
+        if len(self.edges) > 0 or self.indptr[-1] > 0:
             print('This graph has already been populated')
             return
         
         assert edges_new < self.num_nodes
 
-        available_nodes: list[int] = []
+        # every edge endpoint is recorded once, so a uniform pick over the
+        # endpoints is a pick proportional to degree. The final edge count is
+        # known up front so the endpoints go into a preallocated array.
+        num_edges = edges_new * (edges_new + 1) // 2 + (self.num_nodes - edges_new - 1) * edges_new
+        available_nodes = np.empty(2 * num_edges, dtype=np.int32)
+        num_available = 0
 
         # create the smallest possible starting graph (edges_new + 1 complete graph)
         for node_0 in range(edges_new):
             for node_1 in range(node_0 + 1, edges_new + 1):
                 _ = self.__add_edge(node_0, node_1)
-                available_nodes += [node_0, node_1]
+                available_nodes[num_available:num_available + 2] = node_0, node_1
+                num_available += 2
 
         # add the rest of the nodes using preferential attachment
         for node_0 in range(edges_new + 1, self.num_nodes):
@@ -143,11 +196,14 @@ class Simulation():
             while edges_to_add > 0:
                 node_1 = node_0
                 while node_1 == node_0:
-                    node_1 = random.choice(available_nodes)
+                    node_1 = int(available_nodes[self.random.randrange(num_available)])
                 if self.__add_edge(node_0, node_1):
-                    available_nodes += [node_0, node_1]
+                    available_nodes[num_available:num_available + 2] = node_0, node_1
+                    num_available += 2
                     edges_to_add -= 1
 
+        self.__finalize_graph()
+
     def play(self, temptation: float = 1.5, dtype: str ='prisoners'): 
         """
         Every node plays every neighbor in a single round of the Prisoner's Dilemma.
@@ -185,33 +241,97 @@ class Simulation():
                 σ_i  = 1 if i is cooperator 0 if defector
                 T    = the temptation parameter
         """
-        dilemma = Dilemma(m=temptation, type=dtype)
-        for edge in self.edges:
-            edge = tuple(edge)
-            node_0 = self.graph[edge[0]]
-            node_1 = self.graph[edge[1]]
-            row, col = dilemma.play(node_0['strategy'].value, node_1['strategy'].value)
-            node_0['utility'] += row
-            node_1['utility'] += col
+        payoffs = self.__payoffs(temptation, dtype)
+        kernels.play_round(self.edge_src, self.edge_dst, self.strategy, self.utility, payoffs)
+
+
+    def step(self,
+             temptation: float = 1.5,
+             threshold: float = 1.0,
+             taxation: float = .5,
+             radius: int = 1,
+             rand: bool = False,
+             dtype: str = 'prisoners'):
+        """
+        Resets the payoffs and runs play, calc_surplus and distribute_tax as a
+        single fused kernel, see those methods for the parameters.
+        """
+        payoffs = self.__payoffs(temptation, dtype)
+        indptr, indices = self.__tax_beneficiaries(taxation, radius, rand)
+        kernels.play_and_redistribute(
+            self.edge_src, self.edge_dst, self.strategy, payoffs,
+            self.utility, self.surplus, self.benefit, threshold,
+            indptr, indices, taxation,
+        )
+
+
+    def iterate(self,
+                temptation: float = 1.5,
+                threshold: float = 1.0,
+                taxation: float = .5,
+                radius: int = 1,
+                rand: bool = False,
+                intensity: float = 1.0,
+                num_updates: int = 1,
+                dtype: str = 'prisoners'):
+        """
+        Runs a whole iteration, step followed by update_strategies, as a single
+        compiled call, see those methods for the parameters.
+        """
+        payoffs = self.__payoffs(temptation, dtype)
+        benef_indptr, benef_indices = self.__tax_beneficiaries(taxation, radius, rand)
+        kernels.iterate(
+            self.edge_src, self.edge_dst, self.strategy, payoffs,
+            self.utility, self.surplus, self.benefit, threshold,
+            benef_indptr, benef_indices, taxation,
+            self.indptr, self.indices, intensity, num_updates, self.rng,
+        )
+
+
+    def __tax_beneficiaries(self, taxation: float, radius: int, rand: bool) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int32]]:
+        """
+        Helper function returning the beneficiary CSR for the fused kernels.
+        With no taxation the kernels leave benefit alone, so it is only
+        cleared here if an earlier taxed round left shares in it, and the
+        beneficiary sets are never built.
+        """
+        if taxation == 0:
+            if self.taxed:
+                self.benefit.fill(0)
+                self.taxed = False
+            return self.indptr, self.indices
+
+        self.taxed = True
+        return self.__beneficiary_csr(radius, rand)
+
+
+    def __payoffs(self, temptation: float, dtype: str) -> npt.NDArray[np.float32]:
+        """
+        Helper function returning the float32 payoff matrix of the Dilemma for
+        a temptation and type, matching the payoff arrays the kernels add it
+        into. Only built the first time it is asked for.
+        """
+        key = (dtype, temptation)
+        if key not in self.payoff_tables:
+            self.payoff_tables[key] = Dilemma(m=temptation, type=dtype).payoffs.astype(np.float32)
+
+        return self.payoff_tables[key]
 
 
     def random_node(self) -> int:
-        return random.choice(list(self.graph.keys()))
+        return int(self.rng.integers(self.num_nodes))
 
 
     def random_neighbor(self, id: int) -> int:
-        return random.choice(list(self.graph[id]["neighbors"]))
+        return int(self.indices[self.indptr[id] + self.rng.integers(self.degree[id])])
 
 
     def calc_surplus(self, threshold: float = 1.0):
         """
         For each node, if the utility exceeds the threshold, move the surplus
-        amount to self.graph[node]["surplus"]
+        amount to self.surplus[node]
         """
-        for node in self.graph.values():
-            if node['utility'] > threshold:
-                node['surplus'] += node['utility'] - threshold
-                node['utility'] = threshold
+        kernels.calc_surplus(self.utility, self.surplus, threshold)
 
 
     def distribute_tax(self, taxation: float = .5, radius: int = 1, rand: bool = False) -> None:
@@ -229,46 +349,65 @@ class Simulation():
             If True, distribute the taxed surplus to a random set of nodes
             equal in size to the calculated beneficiary radius.
         """
+        self.taxed = self.taxed or taxation != 0
+        indptr, indices = self.__beneficiary_csr(radius, rand)
+        kernels.distribute_tax(self.surplus, self.benefit, indptr, indices, taxation)
 
-        for id, node in self.graph.items():
-            if node['surplus'] > 0:
-                beneficiary_set = self.collect_random_beneficiary_set(id) if rand else self.collect_beneficiary_set(id, radius)
-                if len(beneficiary_set) == 0:
-                    continue
 
-                tax = node['surplus'] * taxation
-                node['surplus'] -= tax
-                share = tax / len(beneficiary_set)
-                for neighbor in beneficiary_set:
-                    self.graph[neighbor]['benefit'] += share
+    def __beneficiary_csr(self, radius: int, rand: bool) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.int32]]:
+        """
+        Helper function for packing the beneficiary set of every node into CSR
+        arrays, the set of node i is indices[indptr[i]:indptr[i + 1]]
+        """
+        # the radius 1 sets are exactly the neighbors, already packed as CSR
+        if radius == 1 and not rand:
+            return self.indptr, self.indices
+
+        key = (radius, rand)
+        if key not in self.beneficiary_csrs:
+            sets = [
+                sorted(self.collect_random_beneficiary_set(id) if rand else self.collect_beneficiary_set(id, radius))
+                for id in range(self.num_nodes)
+            ]
+            indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(beneficiaries) for beneficiaries in sets])
+            indices = np.fromiter(chain.from_iterable(sets), dtype=np.int32, count=int(indptr[-1]))
+            self.beneficiary_csrs[key] = (indptr, indices)
+
+        return self.beneficiary_csrs[key]
 
 
     def collect_beneficiary_set(self, center: int, radius: int) -> set[int]:
-        if center in self.beneficiary_sets:
-            return self.beneficiary_sets[center]
-
-        stack = [(0, center)]
-        visted: set[int] = set()
-        while stack:
-            dist, curr = stack.pop(0)
-            visted.add(curr)
+        if radius == 1:
+            return set(self.indices[self.indptr[center]:self.indptr[center + 1]].tolist())
+
+        if (center, radius) in self.beneficiary_sets:
+            return self.beneficiary_sets[(center, radius)]
+
+        # breadth first so every node is queued once, at its shortest distance
+        queue = deque([(0, center)])
+        visted: set[int] = {center}
+        while queue:
+            dist, curr = queue.popleft()
             if dist < radius:
-                for next in self.graph[curr]['neighbors']:
-                    stack.insert(0, (dist+1, next))
+                for next in self.indices[self.indptr[curr]:self.indptr[curr + 1]].tolist():
+                    if next not in visted:
+                        visted.add(next)
+                        queue.append((dist+1, next))
         visted.remove(center)
-        self.beneficiary_sets[center] = visted
+        self.beneficiary_sets[(center, radius)] = visted
 
         return visted
 
 
     def collect_random_beneficiary_set(self, id: int) -> set[int]:
-        if id in self.beneficiary_sets:
-            return self.beneficiary_sets[id]
-        degree = len(self.graph[id]['neighbors'])
+        if id in self.random_beneficiary_sets:
+            return self.random_beneficiary_sets[id]
+        degree = int(self.degree[id])
         random_set: set[int] = set()
         for _ in range(degree):
-            random_set.add(random.randint(0, self.num_nodes - 1))
-        self.beneficiary_sets[id] = random_set
+            random_set.add(self.random.randint(0, self.num_nodes - 1))
+        self.random_beneficiary_sets[id] = random_set
 
         return random_set
 
@@ -288,20 +427,21 @@ class Simulation():
         performing much worse, i does not update the strategy.
 
         p = the probability of agent i adopting agent j's strategy
-        p = 1 / 1 + Exp(-ß(f_i - f_j))
+        p = 1 / 1 + Exp(-ß(f_j - f_i))
             where
                 ß = intensity of selection, a learning rate.
                     * large ß means they will update at minor differences
                     * small ß means they are prone to make immitation mistakes
+
+        All num_updates agents compare against the same snapshot of strategies
+        and fitness, which matches the sequential rule whenever no two picks
+        overlap (always the case for num_updates = 1). The draws come from
+        self.rng, seeded by the seed passed to Simulation.
         """
-        for _ in range(num_updates):
-            i = self.random_node()
-            j = self.random_neighbor(i)
-            fi = self.calculate_fitness(i)
-            fj = self.calculate_fitness(j)
-            p = 1 / (1 + math.exp(-intensity * (fj - fi)))
-            if random.choices([True, False], weights=[p, 1-p], k=1):
-                self.graph[i]['strategy'] = self.graph[j]['strategy']
+        kernels.update_strategies(
+            self.strategy, self.surplus, self.benefit, self.indptr, self.indices,
+            intensity, num_updates, self.rng,
+        )
 
 
 
@@ -330,18 +470,16 @@ class Simulation():
         id : int
             The id of the agent.
         """
-        node = self.graph[id]
-        return node['surplus'] + node['benefit']
+        return float(self.surplus[id] + self.benefit[id])
 
 
     def reset_payoffs(self):
         """
         Reset payoffs so the simulation can be repeated
         """
-        for node in self.graph.values():
-            node['utility'] = 0
-            node['surplus'] = 0
-            node['benefit'] = 0
+        self.utility.fill(0)
+        self.surplus.fill(0)
+        self.benefit.fill(0)
 
 
     def get_num_cooperate(self) -> int:
@@ -352,12 +490,9 @@ class Simulation():
         -------
         int : The number of cooperators.
         """
-        num_cooperate = 0
-        for node in self.graph.values():
-            if node['strategy'] == Strategy.COOPERATE:
-                num_cooperate += 1
-
-        return num_cooperate
+        # strategy holds 1 for cooperate and 0 for defect, so counting the
+        # nonzero bytes directly skips building a comparison mask
+        return int(np.count_nonzero(self.strategy))
 
 
     def strategy_distribution(self) -> tuple[float, float]:
@@ -374,20 +509,31 @@ class Simulation():
         return num_cooperate / self.num_nodes, num_defect / self.num_nodes
 
 
-    def run(self, iterations: int) -> tuple[float, float]:
+    def run(self, iterations: int, verbose: bool = False) -> tuple[float, float]:
         """
         Defines the main loop for the simulation
-        """        
+
+        Parameters
+        ----------
+        iterations : int
+            Maximum number of rounds to play.
+
+        verbose : bool
+            Also print a counter every round, the strategy distribution is
+            printed every 1000 rounds either way.
+        """
         for iter in range(iterations):
-            print("Iteration:", iter, end="\r")
-            self.play(temptation=1.2)
-            self.calc_surplus(threshold=1.0)
-            self.distribute_tax(taxation=.7, radius=2)
-            self.update_strategies(intensity=1.0, num_updates=1)
-            self.reset_payoffs()
+            if verbose:
+                print("Iteration:", iter, end="\r")
+            self.iterate(temptation=1.2, threshold=1.0, taxation=.7, radius=2, intensity=1.0, num_updates=1)
             if iter % 1000 == 0:
                 print(iter, ":", self.strategy_distribution())
 
+            # nobody can imitate a strategy that is gone, so consensus is final
+            if iter % 100 == 0 and self.get_num_cooperate() in (0, self.num_nodes):
+                iterations = iter + 1
+                break
+
         print(f"\rCompleted {iterations} rounds.")
 
         return self.strategy_distribution()
@@ -395,7 +541,7 @@ class Simulation():
 
 
     def average_degree(self) -> float:
-        return sum(len(node['neighbors']) for node in self.graph.values()) / self.num_nodes
+        return float(self.indptr[-1]) / self.num_nodes
 
 
 
@@ -0,0 +1,11 @@
+"""
+The modules in src and analysis import each other as scripts (from dilemma
+import Dilemma), so both are put on the path the same way running them from
+there would.
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "analysis"))
@@ -0,0 +1,43 @@
+import pytest
+
+from dilemma import ORDERS, Dilemma
+
+# the values each dilemma gave (t, r, p, s) before the payoff matrix, ordered
+# greatest to smallest as [m, 1, 0, 1 - m]
+OLD_VALUES = {
+    "prisoners": lambda m: {"t": m, "r": 1, "p": 0, "s": 1 - m},
+    "harmony":   lambda m: {"r": m, "t": 1, "s": 0, "p": 1 - m},
+    "staghunt":  lambda m: {"r": m, "t": 1, "p": 0, "s": 1 - m},
+    "snowdrift": lambda m: {"t": m, "r": 1, "s": 0, "p": 1 - m},
+    "deadlock":  lambda m: {"t": m, "p": 1, "r": 0, "s": 1 - m},
+}
+
+
+def old_board(type: str, m: float) -> dict[tuple[bool, bool], tuple[float, float]]:
+    v = OLD_VALUES[type](m)
+    return {
+        (True, True): (v["r"], v["r"]),
+        (True, False): (v["s"], v["t"]),
+        (False, True): (v["t"], v["s"]),
+        (False, False): (v["p"], v["p"]),
+    }
+
+
+@pytest.mark.parametrize("type", sorted(ORDERS))
+@pytest.mark.parametrize("m", [1.2, 1.5, 2.0])
+def test_payoffs_match_old_board(type, m):
+    dilemma = Dilemma(type=type, m=m)
+    for (r_move, c_move), (r_val, c_val) in old_board(type, m).items():
+        assert dilemma.play(r_move, c_move) == pytest.approx((r_val, c_val))
+        assert dilemma.payoffs[int(r_move), int(c_move)] == pytest.approx(r_val)
+        assert dilemma.payoffs[int(c_move), int(r_move)] == pytest.approx(c_val)
+
+
+def test_payoffs_are_read_only():
+    with pytest.raises(ValueError):
+        Dilemma().payoffs[0, 0] = 5.0
+
+
+def test_unknown_dilemma_raises():
+    with pytest.raises(Exception):
+        Dilemma(type="chicken")
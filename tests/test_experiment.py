@@ -0,0 +1,72 @@
+import numpy as np
+
+from experiment import run_many, run_task
+
+
+def make_tasks() -> list[dict]:
+    return [
+        {
+            "network_type": network_type,
+            "N": 100,
+            "iterations": 300,
+            "T": T,
+            "alpha": 0.5,
+            "theta": 1.0,
+            "beta": 1.0,
+            "radius": 1,
+            "rand_beneficiaries": False,
+            "seed": seed,
+        }
+        for network_type, T, seed in [("HRG", 1.2, 0), ("PAG", 1.5, 1), ("HRG", 1.8, 2)]
+    ]
+
+
+def test_run_many_matches_serial_runs_in_task_order():
+    tasks = make_tasks()
+    expected = [run_task(task) for task in tasks]
+
+    results = list(run_many(tasks, max_workers=2))
+
+    assert len(results) == len(tasks)
+    for (run_id, params, stats, history), (exp_id, exp_params, exp_stats, exp_history) in zip(results, expected):
+        assert run_id == exp_id
+        assert params == exp_params
+        assert stats == exp_stats
+        np.testing.assert_array_equal(history, exp_history)
+
+
+def run(network_type: str, N: int, iterations: int, T: float, alpha: float, seed: int):
+    return run_task({
+        "network_type": network_type,
+        "N": N,
+        "iterations": iterations,
+        "T": T,
+        "alpha": alpha,
+        "theta": 1.0,
+        "beta": 1.0,
+        "radius": 2,
+        "rand_beneficiaries": False,
+        "seed": seed,
+    })
+
+
+def test_run_stops_at_consensus():
+    _, _, stats, history = run("PAG", N=50, iterations=5000, T=2.0, alpha=0.0, seed=0)
+
+    assert stats["converged"]
+    assert stats["iters_to_conv"] < 5000
+    assert stats["final_frac_coop"] in (0.0, 1.0)
+    stop = stats["iters_to_conv"] - 1
+    assert np.all((history[:stop] > 0) & (history[:stop] < 1))
+    assert np.all(history[stop:] == stats["final_frac_coop"])
+
+
+def test_run_does_not_stop_while_both_strategies_remain():
+    # a few cooperators hold out for hundreds of single updates here, long
+    # stretches without a change don't mean the run has settled
+    _, _, stats, history = run("PAG", N=200, iterations=5000, T=1.5, alpha=0.7, seed=0)
+
+    assert not stats["converged"]
+    assert stats["iters_to_conv"] == 5000
+    assert 0 < stats["final_frac_coop"] < 1
+    assert 0 < history[-1] < 1
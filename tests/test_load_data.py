@@ -0,0 +1,63 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+import load_data
+from load_data import read_table
+from test_logger import log_sweep
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    """ A data directory holding the same six runs as csv and as parquet """
+    monkeypatch.setattr(load_data, "ROOT", tmp_path)
+    log_sweep(str(tmp_path / "data" / "runs.csv"), str(tmp_path / "data" / "parquet" / "runs"), range(6))
+    return tmp_path
+
+
+FILTERS = [
+    None,
+    [("network_type", "==", "HRG")],
+    [("seed", "in", [1, 2, 5]), ("network_type", "==", "PAG")],
+]
+
+
+def read_sorted(columns=None, filters=None) -> pd.DataFrame:
+    return read_table("runs", columns=columns, filters=filters).sort_values("seed", ignore_index=True)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_parquet_and_csv_read_the_same(root, filters):
+    from_parquet = read_sorted(filters=filters)
+    shutil.rmtree(root / "data" / "parquet")
+    from_csv = read_sorted(filters=filters)
+
+    pd.testing.assert_frame_equal(from_parquet, from_csv, check_dtype=False, check_categorical=False)
+
+
+def test_filters_select_the_matching_rows(root):
+    assert list(read_sorted(filters=[("network_type", "==", "HRG")])["seed"]) == [1, 3, 5]
+    assert list(read_sorted(filters=FILTERS[2])["seed"]) == [2]
+
+
+def test_columns_and_dtypes(root):
+    df = read_sorted(columns=["seed", "network_type", "T"])
+    assert list(df.columns) == ["seed", "network_type", "T"]
+    assert isinstance(df["network_type"].dtype, pd.CategoricalDtype)
+    assert df["T"].dtype == "float32"
+
+
+def test_falls_back_to_csv_while_only_a_temporary_part_exists(root):
+    # a sweep still writing its first part, the csv already has every run
+    parquet_dir = root / "data" / "parquet" / "runs"
+    for part in parquet_dir.iterdir():
+        part.rename(parquet_dir / f".{part.name}.tmp")
+
+    assert list(read_sorted()["seed"]) == list(range(6))
+
+
+def test_unsupported_filter_op_raises(root):
+    shutil.rmtree(root / "data" / "parquet")
+    with pytest.raises(ValueError):
+        read_table("runs", filters=[("seed", ">", 2)])
@@ -0,0 +1,150 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import logger
+from logger import (
+    RUN_FIELDS,
+    TIMESERIES_SCHEMA,
+    RunLogger,
+    close_writer,
+    has_parts,
+    log_run_summary,
+    log_timeseries,
+    open_parquet_writer,
+)
+
+
+def run_rows(seeds) -> list[tuple[str, dict, dict]]:
+    """ (run_id, params, stats) of a few made up runs """
+    return [
+        (
+            f"HRG_T1.50_a0.50_s{seed}",
+            {
+                "seed": seed,
+                "network_type": "HRG" if seed % 2 else "PAG",
+                "N": 100,
+                "avg_degree": 3.96,
+                "T": 1.5,
+                "alpha": 0.5,
+                "theta": 1.0,
+                "beta": 1.0,
+                "beneficiary_rule": "nearest",
+                "init_frac_coop": 0.5,
+            },
+            {"converged": seed % 3 == 0, "iters_to_conv": 1000 + seed, "final_frac_coop": seed / 10},
+        )
+        for seed in seeds
+    ]
+
+
+def log_sweep(csv_path: str, parquet_path: str, seeds):
+    run_logger = RunLogger(path=csv_path, parquet_path=parquet_path)
+    for run_id, params, stats in run_rows(seeds):
+        log_run_summary(run_logger, run_id, params, stats)
+    run_logger.close()
+
+
+@pytest.fixture
+def timeseries_paths(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "timeseries.csv")
+    parquet_path = str(tmp_path / "parquet" / "timeseries")
+    monkeypatch.setattr(logger, "TIMESERIES_FILE", csv_path)
+    monkeypatch.setattr(logger, "TIMESERIES_PARQUET", parquet_path)
+    yield csv_path, parquet_path
+    close_writer(csv_path)
+    close_writer(parquet_path)
+
+
+def test_parquet_part_is_renamed_into_place_on_close(tmp_path):
+    directory = str(tmp_path / "parts")
+    table = pa.table({"run_id": ["a", "a"], "iter": [0, 1], "frac_coop": [0.5, 0.25]}, schema=TIMESERIES_SCHEMA)
+
+    open_parquet_writer(directory, TIMESERIES_SCHEMA).write_table(table)
+    (pending,) = os.listdir(directory)
+    assert pending.startswith(".") and pending.endswith(".tmp")
+    assert not has_parts(directory)
+
+    close_writer(directory)
+    (part,) = os.listdir(directory)
+    assert part == pending[1:-len(".tmp")]
+    assert has_parts(directory)
+    assert pq.read_table(directory).equals(table)
+
+
+def test_run_logger_writes_csv_and_parquet(tmp_path):
+    csv_path, parquet_path = str(tmp_path / "runs.csv"), str(tmp_path / "parquet" / "runs")
+    log_sweep(csv_path, parquet_path, range(4))
+
+    from_csv = pd.read_csv(csv_path)
+    from_parquet = pd.read_parquet(parquet_path)
+    assert list(from_csv.columns) == RUN_FIELDS
+    assert len(from_csv) == 4
+    pd.testing.assert_frame_equal(from_parquet, from_csv, check_dtype=False)
+
+
+def test_every_sweep_adds_a_part(tmp_path):
+    csv_path, parquet_path = str(tmp_path / "runs.csv"), str(tmp_path / "parquet" / "runs")
+    log_sweep(csv_path, parquet_path, range(3))
+    log_sweep(csv_path, parquet_path, range(3, 5))
+
+    assert len(os.listdir(parquet_path)) == 2
+    assert sorted(pd.read_parquet(parquet_path)["seed"]) == list(range(5))
+    assert len(pd.read_csv(csv_path)) == 5
+
+
+def test_first_sweep_backfills_parquet_from_csv(tmp_path):
+    csv_path, parquet_path = str(tmp_path / "runs.csv"), str(tmp_path / "parquet" / "runs")
+
+    # runs logged before there were parquet copies
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RUN_FIELDS)
+        writer.writeheader()
+        for run_id, params, stats in run_rows(range(3)):
+            writer.writerow({"run_id": run_id, **params, **stats})
+
+    log_sweep(csv_path, parquet_path, range(3, 5))
+    log_sweep(csv_path, parquet_path, range(5, 6))
+
+    assert len(os.listdir(parquet_path)) == 3
+    from_parquet = pd.read_parquet(parquet_path).sort_values("seed", ignore_index=True)
+    from_csv = pd.read_csv(csv_path).sort_values("seed", ignore_index=True)
+    assert list(from_parquet["seed"]) == list(range(6))
+    pd.testing.assert_frame_equal(from_parquet, from_csv, check_dtype=False)
+
+
+def test_log_timeseries_writes_csv_and_parquet(timeseries_paths):
+    csv_path, parquet_path = timeseries_paths
+    histories = {"a": np.array([0.5, 0.25, 0.125], dtype=np.float32), "b": np.array([0.75, 1.0], dtype=np.float32)}
+    for run_id, history in histories.items():
+        log_timeseries(run_id, history)
+    close_writer(csv_path)
+    close_writer(parquet_path)
+
+    from_csv = pd.read_csv(csv_path)
+    from_parquet = pd.read_parquet(parquet_path)
+    pd.testing.assert_frame_equal(from_parquet, from_csv, check_dtype=False)
+    np.testing.assert_array_equal(from_parquet["frac_coop"], np.concatenate(list(histories.values())))
+
+    # one row group per run
+    (part,) = os.listdir(parquet_path)
+    assert pq.ParquetFile(os.path.join(parquet_path, part)).num_row_groups == len(histories)
+
+
+def test_log_timeseries_backfills_parquet_from_csv(timeseries_paths):
+    csv_path, parquet_path = timeseries_paths
+    with open(csv_path, "w", newline="") as f:
+        f.write("run_id,iter,frac_coop\r\nold,0,0.5\r\nold,1,0.75\r\n")
+
+    log_timeseries("new", np.array([0.25], dtype=np.float32))
+    close_writer(csv_path)
+    close_writer(parquet_path)
+
+    from_parquet = pd.read_parquet(parquet_path).sort_values(["run_id", "iter"], ignore_index=True)
+    assert list(from_parquet["run_id"]) == ["new", "old", "old"]
+    assert len(pd.read_csv(csv_path)) == 3
@@ -0,0 +1,170 @@
+import numpy as np
+import numpy.typing as npt
+import pytest
+
+from main import Simulation
+
+N = 200
+ROUNDS = 300
+
+
+def build(network: str, seed: int = 3) -> Simulation:
+    sim = Simulation(N, seed=seed)
+    getattr(sim, f"build_{network}")()
+    return sim
+
+
+def taxation_at(round: int) -> float:
+    """ Alternates 50 taxed and 50 untaxed rounds """
+    return 0.0 if (round // 50) % 2 else 0.5
+
+
+def assert_same_state(a: Simulation, b: Simulation):
+    np.testing.assert_array_equal(a.strategy, b.strategy)
+    np.testing.assert_array_equal(a.utility, b.utility)
+    np.testing.assert_array_equal(a.surplus, b.surplus)
+    np.testing.assert_array_equal(a.benefit, b.benefit)
+
+
+def assert_simple_graph(sim: Simulation):
+    """ The CSR adjacency and the edge arrays describe the same simple undirected graph """
+    np.testing.assert_array_equal(np.diff(sim.indptr), sim.degree)
+    assert sim.indptr[-1] == 2 * len(sim.edge_src)
+    rows = np.repeat(np.arange(sim.num_nodes), sim.degree)
+    assert np.all(rows != sim.indices)  # no self loops
+    for node in range(sim.num_nodes):
+        assert np.all(np.diff(sim.indices[sim.indptr[node]:sim.indptr[node + 1]]) > 0)  # sorted, no repeats
+    csr_edges = set(zip(rows.tolist(), sim.indices.tolist()))
+    assert csr_edges == {(j, i) for i, j in csr_edges}
+    assert csr_edges == set(zip(sim.edge_src.tolist(), sim.edge_dst.tolist())) | set(zip(sim.edge_dst.tolist(), sim.edge_src.tolist()))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("degree", [2, 4, 6])
+def test_HRG_fills_every_node_to_degree(seed, degree):
+    sim = Simulation(N, seed=seed)
+    sim.build_HRG(degree=degree)
+    assert_simple_graph(sim)
+    # the relaxed build leaves at most one node two endpoints short of degree
+    missing = N * degree - int(sim.indptr[-1])
+    assert sim.degree.max() == degree
+    assert 0 <= missing <= 2
+    assert len(sim.edge_src) == (N * degree - missing) // 2
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("edges_new", [1, 2, 4])
+def test_PAG_adds_edges_new_edges_per_node(seed, edges_new):
+    sim = Simulation(N, seed=seed)
+    sim.build_PAG(edges_new=edges_new)
+    assert_simple_graph(sim)
+    # a complete graph on the first edges_new + 1 nodes, then edges_new per node
+    seed_edges = edges_new * (edges_new + 1) // 2
+    assert len(sim.edge_src) == seed_edges + (N - edges_new - 1) * edges_new
+    assert sim.degree.min() >= edges_new
+
+
+def within(sim: Simulation, radius: int) -> npt.NDArray[np.bool_]:
+    """ reach[i, j] is whether j is at most radius hops from i, by boolean matrix powers """
+    adjacency = np.zeros((sim.num_nodes, sim.num_nodes), dtype=np.int64)
+    adjacency[sim.edge_src, sim.edge_dst] = 1
+    adjacency[sim.edge_dst, sim.edge_src] = 1
+    reach = np.eye(sim.num_nodes, dtype=np.int64)
+    for _ in range(radius):
+        reach = ((reach + reach @ adjacency) > 0).astype(np.int64)
+    return reach > 0
+
+
+@pytest.mark.parametrize("network", ["HRG", "PAG"])
+@pytest.mark.parametrize("radius", [1, 2, 3])
+def test_beneficiary_set_is_every_node_within_radius(network, radius):
+    sim = build(network)
+    reach = within(sim, radius)
+    for center in range(N):
+        expected = set(np.flatnonzero(reach[center]).tolist()) - {center}
+        assert sim.collect_beneficiary_set(center, radius) == expected
+
+
+@pytest.mark.parametrize("network", ["HRG", "PAG"])
+@pytest.mark.parametrize("radius, rand", [(1, False), (2, False), (2, True)])
+def test_step_matches_separate_calls(network, radius, rand):
+    fused, separate = build(network), build(network)
+    for round in range(ROUNDS):
+        taxation = taxation_at(round)
+
+        fused.step(temptation=1.3, threshold=1.0, taxation=taxation, radius=radius, rand=rand)
+        fused.update_strategies(intensity=1.0, num_updates=5)
+
+        separate.reset_payoffs()
+        separate.play(temptation=1.3)
+        separate.calc_surplus(threshold=1.0)
+        separate.distribute_tax(taxation=taxation, radius=radius, rand=rand)
+        separate.update_strategies(intensity=1.0, num_updates=5)
+
+        assert_same_state(fused, separate)
+
+
+@pytest.mark.parametrize("network", ["HRG", "PAG"])
+def test_iterate_matches_step_and_update(network):
+    fused, separate = build(network), build(network)
+    for round in range(ROUNDS):
+        taxation = taxation_at(round)
+
+        fused.iterate(temptation=1.3, taxation=taxation, radius=2, intensity=1.0, num_updates=5)
+
+        separate.step(temptation=1.3, taxation=taxation, radius=2)
+        separate.update_strategies(intensity=1.0, num_updates=5)
+
+        assert_same_state(fused, separate)
+
+
+def test_same_seed_same_run():
+    a, b = build("PAG", seed=11), build("PAG", seed=11)
+    for _ in range(ROUNDS):
+        a.iterate(temptation=1.3, radius=2, rand=True, num_updates=3)
+        b.iterate(temptation=1.3, radius=2, rand=True, num_updates=3)
+    assert_same_state(a, b)
+
+
+def test_num_cooperate_follows_strategy():
+    sim = build("HRG")
+    assert sim.get_num_cooperate() == N // 2
+
+    for _ in range(ROUNDS):
+        sim.step(temptation=1.3, radius=1)
+        sim.update_strategies(intensity=1.0, num_updates=5)
+        assert sim.get_num_cooperate() == np.count_nonzero(sim.strategy)
+
+    sim.strategy[:] = 1
+    assert sim.strategy_distribution() == (1.0, 0.0)
+
+
+def test_fermi_update_does_not_always_imitate():
+    sim = build("HRG")
+    cooperators = sim.strategy == 1
+    # cooperators are far fitter, so defectors should copy them and they should
+    # never copy a defector back
+    sim.surplus[cooperators] = 100.0
+    sim.surplus[~cooperators] = 0.0
+
+    for _ in range(50):
+        sim.update_strategies(intensity=1.0, num_updates=10)
+        assert np.all(sim.strategy[cooperators] == 1)
+
+    assert sim.get_num_cooperate() > N // 2
+
+
+def test_fermi_update_at_zero_intensity_is_a_coin_flip():
+    sim = build("HRG")
+    sim.strategy[:] = np.arange(N) % 2  # every neighbor pairing is random here
+    num_updates = 20000
+    adopted = 0
+    for _ in range(num_updates // 100):
+        before = sim.strategy.copy()
+        sim.update_strategies(intensity=0.0, num_updates=100)
+        adopted += np.count_nonzero(sim.strategy != before)
+        sim.strategy[:] = before
+
+    # p = 1/2 for every draw and about half the picked neighbors play the
+    # other strategy, so about a quarter of the draws show up as a change
+    assert 0.15 * num_updates < adopted < 0.35 * num_updates